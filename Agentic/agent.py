@@ -1,7 +1,6 @@
 import os
 import re 
 import dotenv
-import json
 import logging
 import httpx  # Use httpx for async requests
 import tweepy
@@ -10,16 +9,34 @@ from typing import Any, Dict, List
 from openai import AsyncOpenAI # Use AsyncOpenAI
 from datetime import datetime
 import google.generativeai as genai
+from Agentic.structured_output import (
+    CLAIMS_SCHEMA,
+    SUMMARY_SCHEMA,
+    IMAGE_SCHEMA,
+    VERIFIER_SCHEMA,
+    VERDICT_SCHEMA,
+    generate_structured_async,
+)
+from Agentic import prompts
+from Agentic.prompts import build_gemini_model, compact, ledger
 
 dotenv.load_dotenv()
 
+# Same models as the root pipeline.py, which served the web app before the workers.
+GEMINI_FLASH = "models/gemini-2.5-flash"
+GEMINI_PRO = "models/gemini-2.5-pro"
+GROK_MODEL = "x-ai/grok-4-fast"
+
 class Agent:
     def __init__(self):
         # Configure Gemini models
         try:
             genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-            self.gemini_flash = genai.GenerativeModel("models/gemini-1.5-flash")
-            self.gemini_pro = genai.GenerativeModel("models/gemini-1.5-pro")
+            self.claims_model = build_gemini_model(GEMINI_FLASH, "extract_points_logic", prompts.CLAIMS_INSTRUCTIONS)
+            self.summary_model = build_gemini_model(GEMINI_FLASH, "summarize_text_logic", prompts.SUMMARY_INSTRUCTIONS)
+            self.image_model = build_gemini_model(GEMINI_FLASH, "analyze_image_logic", prompts.IMAGE_INSTRUCTIONS)
+            self.verifier_model = build_gemini_model(GEMINI_FLASH, "verifier_agent_logic", prompts.VERIFIER_INSTRUCTIONS)
+            self.main_brain_model = build_gemini_model(GEMINI_PRO, "main_brain_logic", prompts.AGGREGATOR_INSTRUCTIONS)
         except Exception as e:
             logging.error(f"Gemini initialization failed: {e}")
             raise
@@ -34,77 +51,74 @@ class Agent:
         except Exception as e:
             logging.error(f"OpenRouter initialization failed: {e}")
             raise
+        ledger.register_prefix("analyze_x_account_logic", prompts.ACCOUNT_RUBRIC)
+        ledger.register_prefix("update_account_profile_logic", prompts.ACCOUNT_UPDATE_INSTRUCTIONS)
+
+    async def _openrouter(self, agent_name: str, instructions: str, request: str) -> str:
+        """Grok call with the static instructions as the (cacheable) system message."""
+        try:
+            # Use await on the async client
+            completion = await self.openrouter_client.chat.completions.create(
+                model=GROK_MODEL,
+                messages=[
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": request},
+                ],
+                temperature=0.5,
+                max_tokens=1500,
+            )
+            ledger.record_openai(agent_name, completion.usage)
+            return completion.choices[0].message.content
+        except Exception as e:
+            logging.error(f"{agent_name} error: {e}")
+            return f"Error: {e}"
 
     # -------------------------
     # Tweet Claim Extraction
     # -------------------------
     async def extract_points_logic(self, tweet_text: str) -> Dict[str, Any]:
-        prompt = f"""
-        You are a summarization expert. Extract all factual claims, opinions, and main points from the tweet.
-
-        Tweet: "{tweet_text}"
-
-        Respond ONLY with JSON:
-        {{
-          "points": ["claim 1", "claim 2", ...]
-        }}
-        """
-        try:
-            # Use async call
-            response = await self.gemini_flash.generate_content_async(prompt)
-            cleaned = response.text.strip().lstrip("```json").rstrip("```")
-            return json.loads(cleaned)
-        except Exception as e:
-            logging.error(f"extract_points_logic error: {e}")
-            return {"error": str(e)}
+        prompt = f'Tweet: "{tweet_text}"'
+        ledger.record_baseline("extract_points_logic", tweet_text)
+        # JSON mode + incremental parsing; near-valid output is repaired locally
+        return await generate_structured_async(self.claims_model, prompt, CLAIMS_SCHEMA, "extract_points_logic")
 
     # -------------------------
     # Article Summarization
     # -------------------------
     async def summarize_text_logic(self, article_text: str) -> Dict[str, Any]:
-        prompt = f"""
-        Summarize the article into one dense factual paragraph.
-        Article:
-        "{article_text}"
-
-        Respond ONLY with JSON:
-        {{
-          "summary": "<your summary>"
-        }}
-        """
-        try:
-            # Use async call
-            response = await self.gemini_flash.generate_content_async(prompt)
-            cleaned = response.text.strip().lstrip("```json").rstrip("```")
-            return json.loads(cleaned)
-        except Exception as e:
-            logging.error(f"summarize_text_logic error: {e}")
-            return {"error": str(e)}
+        prompt = f'Article:\n"{article_text}"'
+        ledger.record_baseline("summarize_text_logic", article_text)
+        return await generate_structured_async(self.summary_model, prompt, SUMMARY_SCHEMA, "summarize_text_logic")
+
+    # -------------------------
+    # Image Analysis (multimodal)
+    # -------------------------
+    async def analyze_image_logic(self, jpeg_bytes: bytes) -> Dict[str, Any]:
+        contents = [{"mime_type": "image/jpeg", "data": jpeg_bytes}]
+        return await generate_structured_async(self.image_model, contents, IMAGE_SCHEMA, "analyze_image_logic")
 
     # -------------------------
     # X Account Analysis (via OpenRouter)
     # -------------------------
     async def analyze_x_account_logic(self, username_or_id, num_posts="50", time_range="6 months"):
-        prompt = f"""
-        Analyze the X account @{username_or_id} for credibility, bias, and hate risk.
-        Fetch up to {num_posts} posts from the last {time_range}.
-        Output structured analysis and score.
+        today = datetime.now().strftime("%Y-%m-%d")
+        request = f"Account: @{username_or_id}. Posts: up to {num_posts} from the last {time_range}. Current date: {today}."
+        ledger.record_baseline("analyze_x_account_logic", request)
+        return await self._openrouter("analyze_x_account_logic", prompts.ACCOUNT_RUBRIC, request)
+
+    async def update_account_profile_logic(self, username, previous_profile, new_posts):
         """
-        try:
-            # Use await on the async client
-            completion = await self.openrouter_client.chat.completions.create(
-                model="x-ai/grok-1",
-                messages=[
-                    {"role": "system", "content": "You are a fact-checking AI agent."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.5,
-                max_tokens=1500,
-            )
-            return completion.choices[0].message.content
-        except Exception as e:
-            logging.error(f"analyze_x_account_logic error: {e}")
-            return f"Error: {e}"
+        Folds newly seen posts into an existing account analysis instead of
+        re-scanning the account's whole history.
+        """
+        posts = "\n".join(f"- {post}" for post in new_posts)
+        request = (
+            f"Account: @{username}\n"
+            f"Previous analysis:\n{previous_profile or '(no previous analysis)'}\n"
+            f"New posts:\n{posts}"
+        )
+        ledger.record_baseline("update_account_profile_logic", request)
+        return await self._openrouter("update_account_profile_logic", prompts.ACCOUNT_UPDATE_INSTRUCTIONS, request)
 
     # -------------------------
     # Verifier Agent
@@ -113,56 +127,24 @@ class Agent:
         claims = tweet_points_result.get("points", [])
         summary = article_summary_result.get("summary", "")
 
-        prompt = f"""
-        Compare tweet claims against article summary.
-
-        Claims:
-        {json.dumps(claims, indent=2)}
-
-        Article Summary:
-        "{summary}"
-
-        Respond ONLY with JSON:
-        {{
-          "overall_verdict": "<Supported / Contradicted / No Overlap>",
-          "results": [...]
-        }}
-        """
-        try:
-            # Use async call
-            response = await self.gemini_flash.generate_content_async(prompt)
-            cleaned = response.text.strip().lstrip("```json").rstrip("```")
-            return json.loads(cleaned)
-        except Exception as e:
-            logging.error(f"verifier_agent_logic error: {e}")
-            return {"error": str(e)}
+        prompt = f'Claims: {compact(claims)}\nArticle Summary: "{summary}"'
+        ledger.record_baseline("verifier_agent_logic", claims, summary)
+        return await generate_structured_async(self.verifier_model, prompt, VERIFIER_SCHEMA, "verifier_agent_logic")
 
     # -------------------------
     # Main Brain (Final Verdict)
     # -------------------------
-    async def main_brain_logic(self, text_result, link_result, x_account_result):
-        prompt = f"""
-        Combine the three analyses and produce a final verdict.
-
-        1. Tweet analysis: {json.dumps(text_result, indent=2)}
-        2. Link analysis: {json.dumps(link_result, indent=2)}
-        3. Account analysis: {x_account_result}
-
-        Respond ONLY with JSON:
-        {{
-          "final_verdict": "<Verdict>",
-          "overall_score": <0-100>,
-          "reason": "<Summary>"
-        }}
-        """
-        try:
-            # Use async call
-            response = await self.gemini_pro.generate_content_async(prompt)
-            cleaned = response.text.strip().lstrip("```json").rstrip("```")
-            return json.loads(cleaned)
-        except Exception as e:
-            logging.error(f"main_brain_logic error: {e}")
-            return {"error": str(e)}
+    async def main_brain_logic(self, text_result, link_result, x_account_result, media_result=None):
+        prompt = (
+            f"1. Tweet analysis: {compact(text_result)}\n"
+            f"2. Link analysis: {compact(link_result)}\n"
+            f"3. Account analysis: {x_account_result}"
+        )
+        if media_result:
+            prompt += f"\n4. Media analysis: {compact(media_result)}"
+        ledger.record_baseline("main_brain_logic", text_result, link_result, x_account_result,
+                               *([media_result] if media_result else []))
+        return await generate_structured_async(self.main_brain_model, prompt, VERDICT_SCHEMA, "main_brain_logic")
 
 
 # -------------------------
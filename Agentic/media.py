@@ -0,0 +1,190 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from PIL import Image, ImageOps
+
+MEDIA_CACHE_DB = os.getenv("MEDIA_CACHE_DB", "media_cache.sqlite")
+MAX_MEDIA_ITEMS = 4               # images analysed per tweet
+MAX_IMAGE_BYTES = 5 * 1024 * 1024 # per download; larger files are abandoned
+MAX_TOTAL_BYTES = 12 * 1024 * 1024
+MAX_IMAGE_SIDE = 768              # longest side sent to the model
+JPEG_QUALITY = 80
+HASH_MATCH_DISTANCE = 3           # max differing bits for two images to count as the same
+
+
+# --- 1. Bounded Fetching ---
+
+def image_urls(media: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """Photo URLs and video/GIF preview frames from `tweet_extractor` media entries."""
+    urls = []
+    for item in media or []:
+        if item.get("type") == "photo":
+            url = item.get("url")
+        else:
+            url = item.get("preview_image_url")
+        if url and url not in urls:
+            urls.append(url)
+    return urls[:MAX_MEDIA_ITEMS]
+
+
+async def _fetch_capped(client: httpx.AsyncClient, url: str, max_bytes: int) -> Optional[bytes]:
+    """Streams one image, giving up as soon as it would exceed `max_bytes`."""
+    try:
+        async with client.stream("GET", url, follow_redirects=True, timeout=10.0) as response:
+            response.raise_for_status()
+            declared = int(response.headers.get("content-length") or 0)
+            if declared > max_bytes:
+                logging.info(f"Skipping {url}: {declared} bytes exceeds cap.")
+                return None
+            data = bytearray()
+            async for chunk in response.aiter_bytes():
+                data.extend(chunk)
+                if len(data) > max_bytes:
+                    logging.info(f"Skipping {url}: exceeded {max_bytes} byte cap.")
+                    return None
+            return bytes(data)
+    except Exception as e:
+        logging.error(f"media fetch error for {url}: {e}")
+        return None
+
+
+async def fetch_images(urls: List[str]) -> List[Dict[str, Any]]:
+    """Downloads images concurrently; the whole batch shares MAX_TOTAL_BYTES."""
+    per_image = min(MAX_IMAGE_BYTES, MAX_TOTAL_BYTES // max(len(urls), 1))
+    async with httpx.AsyncClient() as client:
+        results = await asyncio.gather(*(_fetch_capped(client, url, per_image) for url in urls))
+    return [{"url": url, "data": data} for url, data in zip(urls, results) if data]
+
+
+# --- 2. Downscaling and Difference Hashing (CPU) ---
+
+def downscale(data: bytes) -> bytes:
+    """Re-encodes an image as a JPEG no larger than MAX_IMAGE_SIDE on its longest side."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        return out.getvalue()
+
+
+def dhash(data: bytes) -> int:
+    """64-bit difference hash: survives re-encoding, resizing and small edits."""
+    with Image.open(io.BytesIO(data)) as img:
+        small = img.convert("L").resize((9, 8), Image.LANCZOS)
+        pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def prepare_image(data: bytes) -> Dict[str, Any]:
+    """Downscales and hashes one image. Run off the event loop."""
+    small = downscale(data)
+    return {"jpeg": small, "dhash": dhash(small)}
+
+
+# --- 3. Local Analysis Cache ---
+
+class MediaCache:
+    """
+    SQLite cache of image analyses keyed by difference hash (dHash). The hash is also
+    split into four 16-bit bands: two hashes within HASH_MATCH_DISTANCE bits
+    must share at least one band, so near-duplicates are found by index lookup.
+    """
+
+    def __init__(self, path: str = MEDIA_CACHE_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS media_analyses (
+                    dhash      TEXT PRIMARY KEY,
+                    band0      INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER,
+                    analysis   TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(media_analyses)")]
+            if "phash" in columns:
+                # Caches created before the key column was named after the hash it holds.
+                conn.execute("ALTER TABLE media_analyses RENAME COLUMN phash TO dhash")
+            for band in range(4):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_media_band{band} ON media_analyses (band{band})")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _bands(hash_value: int) -> List[int]:
+        return [(hash_value >> (16 * i)) & 0xFFFF for i in range(4)]
+
+    def get(self, hash_value: int) -> Optional[str]:
+        bands = self._bands(hash_value)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT dhash, analysis FROM media_analyses WHERE band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?",
+                bands,
+            ).fetchall()
+        best = min(rows, key=lambda row: bin(int(row[0], 16) ^ hash_value).count("1"), default=None)
+        if best and bin(int(best[0], 16) ^ hash_value).count("1") <= HASH_MATCH_DISTANCE:
+            return best[1]
+        return None
+
+    def put(self, hash_value: int, analysis: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO media_analyses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (f"{hash_value:016x}", *self._bands(hash_value), analysis, time.time()),
+            )
+
+
+# --- 4. Media Stage ---
+
+async def analyze_tweet_media(agent, media: Optional[List[Dict[str, Any]]], cache: MediaCache) -> Dict[str, Any]:
+    """
+    Fetches, downscales and analyses the tweet's images. Images seen before
+    (same or near-identical dHash) are answered from `cache`.
+    """
+    urls = image_urls(media)
+    if not urls:
+        return {"images": [], "note": "No analysable media."}
+
+    fetched = await fetch_images(urls)
+    prepared = await asyncio.gather(*(asyncio.to_thread(prepare_image, item["data"]) for item in fetched),
+                                    return_exceptions=True)
+
+    async def analyse(url: str, image: Dict[str, Any]) -> Dict[str, Any]:
+        # The cache does blocking SQLite I/O, so it runs off the event loop too.
+        cached = await asyncio.to_thread(cache.get, image["dhash"])
+        if cached:
+            return {"url": url, "cached": True, **json.loads(cached)}
+        result = await agent.analyze_image_logic(image["jpeg"])
+        if "error" not in result:
+            await asyncio.to_thread(cache.put, image["dhash"], json.dumps(result, separators=(",", ":")))
+        return {"url": url, "cached": False, **result}
+
+    tasks = []
+    for item, image in zip(fetched, prepared):
+        if isinstance(image, Exception):
+            logging.error(f"Could not decode image {item['url']}: {image}")
+            continue
+        tasks.append(analyse(item["url"], image))
+    images = await asyncio.gather(*tasks)
+
+    skipped = len(urls) - len(images)
+    result = {"images": list(images)}
+    if skipped:
+        result["note"] = f"{skipped} media item(s) could not be fetched or decoded."
+    return result
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+PROFILE_DB = os.getenv("PROFILE_DB", "account_profiles.sqlite")
+
+
+class ProfileStore:
+    """
+    SQLite cache of account analyses, keyed by lower-cased username.
+    Lets the pipeline skip the account branch while a profile is still fresh.
+    """
+
+    def __init__(self, path: str = PROFILE_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS profiles (
+                    username   TEXT PRIMARY KEY,
+                    analysis   TEXT NOT NULL,
+                    since_id   TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored profile for `username`, however old."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM profiles WHERE username = ?", (username.lower(),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_fresh(self, username: str, max_age: float) -> Optional[Dict[str, Any]]:
+        """Returns the stored profile only if it was updated within `max_age` seconds."""
+        profile = self.get(username)
+        if profile and time.time() - profile["updated_at"] <= max_age:
+            return profile
+        return None
+
+    def put(self, username: str, analysis: str, since_id: Optional[str] = None):
+        """Stores an analysis. `since_id` is kept from the previous row when not given."""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO profiles (username, analysis, since_id, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(username) DO UPDATE SET
+                    analysis = excluded.analysis,
+                    since_id = COALESCE(excluded.since_id, profiles.since_id),
+                    updated_at = excluded.updated_at
+                """,
+                (username.lower(), analysis, since_id, time.time()),
+            )
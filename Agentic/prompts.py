@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict
+import google.generativeai as genai
+
+# Static instructions for every agent, built once at import. They are sent
+# as the system instruction / first message so each request starts with an
+# identical prefix that provider-side context caching can reuse; only the
+# per-tweet payload changes between calls.
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load(filename: str) -> str:
+    with open(os.path.join(_ROOT, filename), encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def compact(data: Any) -> str:
+    """JSON for prompt payloads: no indentation or spaces, which only cost tokens."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+# --- 1. Account Analysis (single source: x_prompt.txt) ---
+
+ACCOUNT_RUBRIC = _load("x_prompt.txt")
+
+ACCOUNT_UPDATE_INSTRUCTIONS = ACCOUNT_RUBRIC + """
+
+You will be given your previous analysis of an account and the posts published since.
+Update the analysis to account for the new posts. Keep the same structure and score
+format; only change what the new posts justify."""
+
+
+# --- 2. Text Claim Agent ---
+
+TEXT_CLAIM_INSTRUCTIONS = """You are an expert fact-checker specializing in social media content.
+Analyze the credibility of the tweet you are given.
+
+Follow these steps carefully:
+1. **Extract Claims**: Identify and list the main factual claim(s). If the tweet is purely an opinion, satire, or a question, explicitly state that in the list.
+2. **Assess Credibility**: Assign a credibility score to the **factual claims only**. The score should be an integer from 0 (verifiably false) to 100 (verifiably true). If the tweet contains no factual claim (e.g., it's just an opinion), the score must be `null`.
+   - **0-20**: Disinformation / Verifiably False
+   - **21-40**: Unlikely / Lacks Evidence
+   - **41-60**: Needs Context / Unverifiable
+   - **61-80**: Plausible / Likely True
+   - **81-100**: Verified / True
+3. **Explain Reasoning**: Provide a brief, neutral explanation for your score. Mention any logical fallacies, emotional language, or lack of sources.
+
+Respond ONLY with a valid JSON object following this structure:
+{"claims": ["List of claims or a statement that it's an opinion."], "credibility_score": <integer or null>, "explanation": "Your concise reasoning here."}"""
+
+CLAIMS_INSTRUCTIONS = """You are a summarization expert. Extract all factual claims, opinions, and main points from the tweet.
+Respond ONLY with JSON: {"points": ["claim 1", "claim 2", ...]}"""
+
+
+# --- 3. Link & Source Agents ---
+
+LINK_INSTRUCTIONS = """You are a digital source analyst. Analyze the credibility of the domains found in a tweet.
+**You cannot access the content of these links directly.** Your analysis must be based on the general reputation of the source domains.
+
+Perform the following tasks:
+1. **Analyze Individual Sources**: For each link, determine the reputation of its domain. Is it a mainstream news outlet, a scientific journal, a government site, a personal blog, a known source of misinformation, etc.?
+2. **Assess Overall Credibility**: Based on the sources, provide an `overall_score` from 0 (sources are highly unreliable and likely weaken the claim) to 100 (sources are highly reputable and strongly support the claim).
+3. **Explain Your Reasoning**: Briefly explain your overall score.
+
+Respond ONLY with a valid JSON object with the following structure:
+{"sources": [{"link": "The full URL", "domain_reputation": "A brief description of the source's reputation."}], "overall_score": <integer>, "explanation": "Your concise explanation for the overall score."}"""
+
+SUMMARY_INSTRUCTIONS = """Summarize the article into one dense factual paragraph.
+Respond ONLY with JSON: {"summary": "<your summary>"}"""
+
+VERIFIER_INSTRUCTIONS = """Compare the tweet claims against the article summary.
+Respond ONLY with JSON: {"overall_verdict": "<Supported / Contradicted / No Overlap>", "results": [{"claim": "...", "verdict": "...", "evidence": "..."}]}"""
+
+
+# --- 4. Media Agent ---
+
+IMAGE_INSTRUCTIONS = """You are a visual fact-checking expert. Describe the image from a social media post.
+Transcribe any visible text, and assess whether it shows signs of manipulation
+(editing artifacts, AI generation, misleading crops, recycled or out-of-context imagery).
+Respond ONLY with JSON: {"description": "<what the image shows>", "visible_text": "<text in the image, or empty>", "manipulation_risk": "<Low / Medium / High>", "manipulation_signs": ["sign 1", ...]}"""
+
+
+# --- 5. Main Brain Aggregator ---
+
+AGGREGATOR_INSTRUCTIONS = """You are a master intelligence analyst. Your mission is to synthesize reports from specialist agents to determine the overall credibility of a tweet.
+
+**Reasoning Framework:**
+Use the following guidelines to weigh the evidence:
+- **Conflict is a Red Flag**: If the claim's score is high but the source and/or account scores are low, the verdict should be **"Misleading"**. A strong claim requires strong backing.
+- **No Sources**: If no links were provided (neutral source score of ~50, or a skipped link report), your verdict must rely more heavily on the text claim's plausibility and the account's reputation.
+- **Opinions**: If the text is identified as an opinion, the verdict must be **"Opinion/Unverifiable"** unless it uses deceptive language to appear as fact.
+- **Media**: If a media report is present, weigh manipulated or out-of-context images heavily.
+- **Errors**: If any agent report contains an "error" field, acknowledge that data is missing and lower your confidence in the final verdict accordingly.
+
+**Final Task:**
+Based on all available data, provide a final verdict. Respond ONLY with a valid JSON object.
+{"final_verdict": "One of ['Verified True', 'Likely True', 'Misleading', 'Likely False', 'Verified False', 'Opinion/Unverifiable']", "overall_score": <integer from 0 to 100>, "reason": "A concise explanation justifying your verdict by referencing the key findings from the agent reports."}"""
+
+
+# --- 6. Precompiled Models ---
+
+def build_gemini_model(model_name: str, agent: str, instructions: str):
+    """One model per agent, created once at startup rather than rebuilt per request."""
+    ledger.register_prefix(agent, instructions)
+    return genai.GenerativeModel(model_name, system_instruction=instructions)
+
+
+# --- 7. Token Accounting ---
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for reporting static prefix sizes."""
+    return max(1, len(text) // 4)
+
+
+class TokenLedger:
+    """
+    Per-agent token usage as reported by the providers. `cached_tokens` is the
+    part of the prompt served from the provider's context cache.
+
+    Call sites also record a baseline: the estimated size of the same call in
+    the old layout, with the instructions inline in the prompt and payloads
+    dumped with indent=2. The report sets it against the actual prompt
+    tokens per call to show what the trimming saves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents: Dict[str, Dict[str, int]] = {}
+        self._prefixes: Dict[str, int] = {}
+        self._baselines: Dict[str, Dict[str, int]] = {}
+
+    def register_prefix(self, agent: str, instructions: str):
+        self._prefixes[agent] = estimate_tokens(instructions)
+
+    def record_baseline(self, agent: str, *payload: Any):
+        """`payload` is what the call sends besides its instructions; str parts are counted as is."""
+        tokens = self._prefixes.get(agent, 0) + sum(
+            estimate_tokens(part if isinstance(part, str) else json.dumps(part, indent=2, default=str))
+            for part in payload
+        )
+        with self._lock:
+            baseline = self._baselines.setdefault(agent, {"calls": 0, "tokens": 0})
+            baseline["calls"] += 1
+            baseline["tokens"] += tokens
+
+    def _add(self, agent: str, prompt: int, cached: int, output: int):
+        with self._lock:
+            totals = self._agents.setdefault(agent, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0})
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt or 0
+            totals["cached_tokens"] += cached or 0
+            totals["output_tokens"] += output or 0
+
+    def record_gemini(self, agent: str, usage):
+        """`usage` is a Gemini response's usage_metadata (None is ignored)."""
+        if usage is None:
+            return
+        self._add(agent, getattr(usage, "prompt_token_count", 0), getattr(usage, "cached_content_token_count", 0),
+                  getattr(usage, "candidates_token_count", 0))
+
+    def record_openai(self, agent: str, usage):
+        """`usage` is an OpenAI-compatible completion's usage block (None is ignored)."""
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self._add(agent, usage.prompt_tokens, getattr(details, "cached_tokens", 0) if details else 0,
+                  usage.completion_tokens)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Per-agent totals, the static prefix each call shares, and the baseline vs. actual prompt size per call."""
+        with self._lock:
+            report = {}
+            for agent, totals in self._agents.items():
+                prefix = self._prefixes.get(agent, 0)
+                avg_prompt = round(totals["prompt_tokens"] / totals["calls"], 1)
+                baseline = self._baselines.get(agent)
+                avg_baseline = round(baseline["tokens"] / baseline["calls"], 1) if baseline else None
+                report[agent] = {
+                    **totals,
+                    "static_prefix_tokens": prefix,
+                    "avg_prompt_tokens": avg_prompt,
+                    "avg_baseline_tokens": avg_baseline,
+                    "saved_per_call": round(avg_baseline - avg_prompt, 1) if baseline else None,
+                    "cached_share": round(totals["cached_tokens"] / totals["prompt_tokens"], 3) if totals["prompt_tokens"] else 0.0,
+                }
+            return report
+
+    def log_report(self):
+        for agent, row in sorted(self.report().items()):
+            per_call = f"prompt={row['avg_prompt_tokens']}/call"
+            if row["avg_baseline_tokens"] is not None:
+                per_call += f" vs baseline~{row['avg_baseline_tokens']}/call (saved~{row['saved_per_call']})"
+            logging.info(
+                f"[tokens] {agent}: calls={row['calls']} prompt={row['prompt_tokens']} "
+                f"cached={row['cached_tokens']} ({row['cached_share']:.0%}) output={row['output_tokens']} "
+                f"static_prefix~{row['static_prefix_tokens']}/call {per_call}"
+            )
+
+
+# Shared by every agent in the process.
+ledger = TokenLedger()
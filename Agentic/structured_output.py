@@ -0,0 +1,312 @@
+import json
+import logging
+import re
+from typing import Any, Dict, Optional
+from Agentic.prompts import ledger
+
+# --- 1. Response Schemas ---
+# One schema per agent. These are passed to Gemini as `response_schema`
+# (provider-native JSON mode) and reused locally to validate the parsed reply.
+
+CLAIMS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "points": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["points"],
+}
+
+SUMMARY_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summary": {"type": "STRING"},
+    },
+    "required": ["summary"],
+}
+
+TEXT_CLAIM_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "claims": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "credibility_score": {"type": "INTEGER", "nullable": True},
+        "explanation": {"type": "STRING"},
+    },
+    "required": ["claims", "credibility_score", "explanation"],
+}
+
+SOURCES_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "sources": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "link": {"type": "STRING"},
+                    "domain_reputation": {"type": "STRING"},
+                },
+                "required": ["link", "domain_reputation"],
+            },
+        },
+        "overall_score": {"type": "INTEGER"},
+        "explanation": {"type": "STRING"},
+    },
+    "required": ["sources", "overall_score", "explanation"],
+}
+
+VERIFIER_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "overall_verdict": {"type": "STRING"},
+        "results": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "claim": {"type": "STRING"},
+                    "verdict": {"type": "STRING"},
+                    "evidence": {"type": "STRING"},
+                },
+                "required": ["claim", "verdict"],
+            },
+        },
+    },
+    "required": ["overall_verdict", "results"],
+}
+
+IMAGE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "description": {"type": "STRING"},
+        "visible_text": {"type": "STRING"},
+        "manipulation_risk": {"type": "STRING"},
+        "manipulation_signs": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["description", "manipulation_risk"],
+}
+
+VERDICT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "final_verdict": {"type": "STRING"},
+        "overall_score": {"type": "INTEGER"},
+        "reason": {"type": "STRING"},
+    },
+    "required": ["final_verdict", "overall_score", "reason"],
+}
+
+
+def json_generation_config(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Gemini generation config that requests native JSON output for `schema`."""
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+# --- 2. Incremental Parser ---
+
+class StreamingJSONParser:
+    """
+    Consumes model output chunk by chunk and tracks the first top-level JSON
+    object as it streams in. Leading prose and markdown fences are ignored,
+    and the object is reported complete as soon as its closing brace arrives,
+    so trailing chatter never reaches `json.loads`.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.started = False
+        self.complete = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> bool:
+        """Adds a chunk of text. Returns True once the object is closed."""
+        for ch in chunk:
+            if self.complete:
+                break
+            if not self.started:
+                if ch != "{":
+                    continue
+                self.started = True
+
+            self.buffer.append(ch)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.complete = True
+        return self.complete
+
+    @property
+    def text(self) -> str:
+        return "".join(self.buffer)
+
+    def result(self) -> Dict[str, Any]:
+        """Parses what has been collected, repairing it if the stream was cut short."""
+        if not self.started:
+            raise ValueError("No JSON object found in model response.")
+        text = self.text
+        if self.complete:
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                pass
+        return json.loads(repair_json(text))
+
+
+# --- 3. Local Repair ---
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def repair_json(text: str) -> str:
+    """
+    Turns near-valid JSON into parsable JSON without another model call:
+    strips fences and surrounding prose, drops trailing commas, terminates an
+    unclosed string and closes any brackets left open.
+    """
+    text = _FENCE_RE.sub("", text.strip())
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object found in model response.")
+    text = text[start:]
+
+    stack = []
+    in_string = False
+    escaped = False
+    end = len(text)
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                end = i + 1
+                break
+
+    text = text[:end]
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    # A dangling key or separator cannot be completed meaningfully; drop it.
+    text = re.sub(r"[,:]\s*$", "", text)
+    if stack and stack[-1] == "}":
+        text = re.sub(r'([{,])\s*"[^"]*"\s*$', r"\1", text)
+        text = re.sub(r",\s*$", "", text)
+    text += "".join(reversed(stack))
+    return _TRAILING_COMMA_RE.sub(r"\1", text)
+
+
+def parse_json_response(text: str) -> Dict[str, Any]:
+    """Parses a complete (non-streamed) model reply."""
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    return parser.result()
+
+
+def validate(data: Any, schema: Dict[str, Any]) -> Optional[str]:
+    """Returns a description of the first schema violation, or None."""
+    if not isinstance(data, dict):
+        return "Response is not a JSON object."
+    missing = [key for key in schema.get("required", []) if key not in data]
+    if missing:
+        return f"Response is missing required field(s): {', '.join(missing)}"
+    return None
+
+
+# --- 4. Model Helpers ---
+
+def _finish(parser: StreamingJSONParser, schema: Dict[str, Any], agent_name: str) -> Dict[str, Any]:
+    try:
+        data = parser.result()
+    except (ValueError, json.JSONDecodeError) as e:
+        logging.error(f"{agent_name}: could not parse model response - {parser.text!r}")
+        return {"error": f"Failed to parse the model's response as JSON: {e}"}
+
+    problem = validate(data, schema)
+    if problem:
+        logging.error(f"{agent_name}: {problem}")
+        return {"error": problem, **data}
+    return data
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text
+    except (ValueError, AttributeError):
+        # Chunks without text parts (e.g. safety or finish metadata).
+        return ""
+
+
+async def generate_structured_async(model, prompt, schema: Dict[str, Any], agent_name: str) -> Dict[str, Any]:
+    """
+    Streams a JSON-mode Gemini call and parses it incrementally.
+    Stops reading as soon as the top-level object is closed.
+    """
+    parser = StreamingJSONParser()
+    usage = None
+    try:
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=json_generation_config(schema),
+            stream=True,
+        )
+        async for chunk in response:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if parser.feed(_chunk_text(chunk)):
+                break
+    except Exception as e:
+        logging.error(f"{agent_name} error: {e}")
+        if not parser.started:
+            return {"error": str(e)}
+    finally:
+        ledger.record_gemini(agent_name, usage)
+    return _finish(parser, schema, agent_name)
+
+
+def generate_structured(model, prompt, schema: Dict[str, Any], agent_name: str) -> Dict[str, Any]:
+    """Synchronous counterpart of `generate_structured_async`."""
+    parser = StreamingJSONParser()
+    usage = None
+    try:
+        response = model.generate_content(
+            prompt,
+            generation_config=json_generation_config(schema),
+            stream=True,
+        )
+        for chunk in response:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if parser.feed(_chunk_text(chunk)):
+                break
+    except Exception as e:
+        logging.error(f"{agent_name} error: {e}")
+        if not parser.started:
+            return {"error": f"An API or other unexpected error occurred: {str(e)}"}
+    finally:
+        ledger.record_gemini(agent_name, usage)
+    return _finish(parser, schema, agent_name)
@@ -1,15 +1,19 @@
-from flask import Flask, request, render_template, redirect, url_for, jsonify
+from flask import Flask, request, render_template, redirect, url_for, jsonify, session
 import tweet_extractor as twitter
-import pipeline as agent
-#import Agentic.pipeline as agent
+from scheduler import FairScheduler, SchedulerRejected, INTERACTIVE
+from job_queue import make_queue, DONE, FAILED
+from history_store import HistoryStore
+from token_cooldowns import get_remaining_ms_for_token, mark_used
+import worker
 import re
-import json
-import time
 import os
 import dotenv
 dotenv.load_dotenv()
 
 app = Flask(__name__)
+# Signs the session cookie that carries the logged-in user. Set FLASK_SECRET_KEY
+# so sessions survive restarts and are shared between web processes.
+app.secret_key = os.environ.get("FLASK_SECRET_KEY") or os.urandom(32)
 
 # -------------------------
 # USER & TOKEN CONFIG
@@ -22,6 +26,13 @@ USERS = {
     "shyam": "guntur",
 }
 
+# Per-user quotas for the scheduler. `weight` is the user's fair share when
+# the system is busy; anyone not listed gets DEFAULT_QUOTA.
+DEFAULT_QUOTA = {"weight": 1.0, "rate_per_min": 6, "burst": 3}
+USER_QUOTAS = {
+    "admin": {"weight": 2.0, "rate_per_min": 20, "burst": 5},
+}
+
 TOKENS = {
     1: os.environ.get("token1"),
     2: os.environ.get("token2"),
@@ -29,36 +40,23 @@ TOKENS = {
     4: os.environ.get("token4")
 }
 
-COOLDOWN_FILE = "token_cooldowns.json"
-COOLDOWN_TIME = 15 * 60 * 1000  # 15 minutes in ms
-
-
-# -------------------------
-# HELPER FUNCTIONS
-# -------------------------
-def load_cooldowns():
-    """Load cooldown timestamps from JSON file (ms since epoch)."""
-    if not os.path.exists(COOLDOWN_FILE):
-        with open(COOLDOWN_FILE, 'w') as f:
-            # initialize with zeros (string keys)
-            json.dump({str(i): 0 for i in TOKENS.keys()}, f)
-    with open(COOLDOWN_FILE, 'r') as f:
-        return json.load(f)
-
+# The web tier only enqueues analyses and reads results; worker.py runs them.
+# memory:// keeps everything in this process (worker threads started below),
+# sqlite:///jobs.sqlite or redis://... let separate worker processes/machines pull jobs.
+job_queue = make_queue(worker.JOB_QUEUE_URL)
+PIPELINE_WORKERS = int(os.environ.get("MAX_CONCURRENT_ANALYSES", 4))
+if worker.JOB_QUEUE_URL.startswith("memory://"):
+    worker.start_thread_workers(job_queue, PIPELINE_WORKERS)
 
-def save_cooldowns(data):
-    """Save cooldown timestamps to JSON file."""
-    with open(COOLDOWN_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+history = HistoryStore()
 
-
-def get_remaining_ms_for_token(token_str):
-    """Return remaining milliseconds of cooldown for a given token string key."""
-    cooldowns = load_cooldowns()
-    last_used = int(cooldowns.get(token_str, 0))
-    now = int(time.time() * 1000)
-    remaining = max(0, COOLDOWN_TIME - (now - last_used))
-    return remaining
+scheduler = FairScheduler(
+    max_concurrent=PIPELINE_WORKERS,
+    max_queue=int(os.environ.get("MAX_QUEUED_ANALYSES", 20)),
+    max_wait=float(os.environ.get("MAX_QUEUE_WAIT_SECONDS", 120)),
+    default_quota=DEFAULT_QUOTA,
+    quotas=USER_QUOTAS,
+)
 
 
 # -------------------------
@@ -75,17 +73,27 @@ def login():
     password = request.form.get('password')
 
     if username in USERS and USERS[username] == password:
-        return redirect(url_for('landing', user=username))
+        # Quotas are keyed on this server-side identity, never on form fields.
+        session['user'] = username
+        return redirect(url_for('landing'))
     else:
         return render_template("index.html", error="Invalid username or password")
 
 
+@app.route('/logout')
+def logout():
+    session.pop('user', None)
+    return redirect(url_for('index'))
+
+
 # -------------------------
 # LANDING PAGE
 # -------------------------
 @app.route('/landing')
 def landing():
-    user = request.args.get('user', 'Guest')
+    user = session.get('user')
+    if not user:
+        return redirect(url_for('index'))
     return render_template("landing.html", user=user)
 
 
@@ -116,20 +124,23 @@ def update_cooldown():
     if token not in [str(k) for k in TOKENS.keys()]:
         return jsonify({"error": "Invalid token"}), 400
 
-    cooldowns = load_cooldowns()
-    cooldowns[token] = int(time.time() * 1000)
-    save_cooldowns(cooldowns)
+    mark_used(token)
     return jsonify({"message": f"Token {token} cooldown updated successfully"})
 
 
 # -------------------------
-# TWEET EXTRACTION + VERDICT
-# (Only update token cooldown AFTER a successful extraction & verdict)
+# TWEET EXTRACTION + ENQUEUE VERDICT
+# (Only update token cooldown AFTER a successful extraction)
 # -------------------------
 @app.route('/extract', methods=['POST'])
-async def extract():
+def extract():
     url = request.form.get('tweet_url')
     selected_token = request.form.get('selected_token')
+    user = session.get('user')
+    reanalyze = request.form.get('reanalyze') == 'on'
+
+    if not user:
+        return "Please log in before analyzing.", 401
 
     if not url:
         return "Tweet URL is required.", 400
@@ -155,31 +166,94 @@ async def extract():
     if not bearer:
         return f"Bearer token for token id {selected_token} not configured on server.", 500
 
-    # Extract tweet and generate verdict -- wrap in try/except
+    # Admission control: rate limit + fair queuing across users.
+    # Reject early (with an estimated wait) instead of piling up requests.
+    try:
+        # Web requests always use the interactive lane; bulk is for watch mode.
+        priority = scheduler.admit_queued(user, INTERACTIVE, job_queue.counts())
+    except SchedulerRejected as e:
+        return (f"⏳ {e} Estimated wait: {e.retry_after}s."), 429, {"Retry-After": str(e.retry_after)}
+
+    # Extract tweet -- wrap in try/except. Every failure hands the admission
+    # back, so a bad URL doesn't cost the user a rate-limit token.
     try:
         tweet_id = url.rstrip("/").split("/")[-1]
         tweet = twitter.extract_tweet_info(tweet_id, bearer)
         if not tweet:
             # extraction failed (tweet missing, invalid id, or API error)
+            scheduler.refund(user, priority)
             return "Failed to extract tweet. Check the URL or token privileges.", 502
 
         # If you want more robust checks, verify required fields:
         if 'text' not in tweet or 'username' not in tweet:
+            scheduler.refund(user, priority)
             return "Tweet data incomplete; extraction likely failed.", 502
+    except Exception as e:
+        # Do NOT update cooldown if extraction fails
+        scheduler.refund(user, priority)
+        return f"Error during processing: {str(e)}", 500
+
+    # SUCCESS -> update cooldown timestamp for this token
+    mark_used(selected_token)
+
+    # Hand the analysis to the workers; loading.html polls /status/<job_id>.
+    job_id = job_queue.enqueue({"tweet": tweet, "tweet_id": tweet_id, "user": user, "reanalyze": reanalyze},
+                               lane=INTERACTIVE, priority=priority)
+    return render_template("loading.html", job_id=job_id)
+
+
+# -------------------------
+# JOB STATUS (AJAX) + RESULT
+# -------------------------
+@app.route('/status/<job_id>', methods=['GET'])
+def status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"status": "failed", "message": "Unknown job."}), 404
+    if job["status"] == DONE:
+        return jsonify({"status": "complete", "redirect_url": url_for('result', job_id=job_id)})
+    if job["status"] == FAILED:
+        return jsonify({"status": "failed", "message": f"Error during processing: {job['error']}"})
+    return jsonify({"status": "pending"})
+
+
+@app.route('/result/<job_id>', methods=['GET'])
+def result(job_id):
+    job = job_queue.get(job_id)
+    if not job or job["status"] != DONE:
+        return "Result not available.", 404
+    return render_template("details.html", tweet=job["payload"]["tweet"], verdict=job["result"])
 
-        # SUCCESS -> update cooldown timestamp for this token
-        cooldowns = load_cooldowns()
-        cooldowns[str(selected_token)] = int(time.time() * 1000)
-        save_cooldowns(cooldowns)
 
-        # Run your pipeline (this may raise — you can catch and return)
-        verdict = agent.run_pipeline(tweet_text=tweet['text'], username=tweet['username'])
+# -------------------------
+# VERDICT HISTORY / SEARCH (JSON)
+# -------------------------
+@app.route('/history', methods=['GET'])
+def history_search():
+    if not session.get('user'):
+        return jsonify({"error": "Please log in to view the history."}), 401
+    args = request.args
+    try:
+        results = history.search(
+            tweet_id=args.get('tweet_id'),
+            username=args.get('username'),
+            verdict=args.get('verdict'),
+            since=args.get('since', type=float),
+            until=args.get('until', type=float),
+            text=args.get('q'),
+            limit=min(args.get('limit', 50, type=int), 500),
+            offset=args.get('offset', 0, type=int),
+        )
     except Exception as e:
-        # Do NOT update cooldown if extraction or verdict fails
-        return f"Error during processing: {str(e)}", 500
-    
-    # Render details page
-    return render_template("details.html", tweet=tweet, verdict=verdict)
+        return jsonify({"error": f"History lookup failed: {str(e)}"}), 500
+    return jsonify({"results": results, "count": len(results)})
+
+
+@app.route('/history/<tweet_id>', methods=['GET'])
+def tweet_history(tweet_id):
+    if not session.get('user'):
+        return jsonify({"error": "Please log in to view the history."}), 401
+    return jsonify({"tweet_id": tweet_id, "analyses": history.history(tweet_id)})
 
 
 # -------------------------
@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+HISTORY_DB = os.environ.get("HISTORY_DB", "history.sqlite")
+
+# Nodes whose timings get their own column, so the export can be analysed
+# without unpacking JSON. Per-link timings are summed into link_evidence.
+TIMED_NODES = ["planner", "text_claim", "account_analysis", "link_evidence", "media_analysis", "aggregator"]
+
+COLUMNS = [
+    "tweet_id", "username", "requested_by", "tweet_text", "tweet_created_at",
+    "likes", "retweets", "replies", "num_links",
+    "final_verdict", "overall_score", "reason", "error",
+    *[f"{node}_seconds" for node in TIMED_NODES],
+    "total_seconds", "analyzed_at", "agent_outputs",
+]
+
+# Per-agent outputs are kept as one JSON column; everything else is a scalar.
+AGENT_OUTPUT_KEYS = ["text_claim_result", "account_analysis_result", "summaries_list", "media_analysis_result", "verifier_result"]
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), default=str)
+
+
+def _to_int(value: Any) -> Optional[int]:
+    # Model output may give the score as a string; keep the column numeric.
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class HistoryStore:
+    """
+    Append-only record of every analysis: the extracted tweet, each agent's
+    output, node timings and the final verdict. Rows are never updated, and
+    the indexes cover the lookups the history API and notebook need.
+    """
+
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            timing_columns = ",\n".join(f"{node}_seconds REAL" for node in TIMED_NODES)
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    id               INTEGER PRIMARY KEY,
+                    tweet_id         TEXT,
+                    username         TEXT,
+                    requested_by     TEXT,
+                    tweet_text       TEXT,
+                    tweet_created_at TEXT,
+                    likes            INTEGER,
+                    retweets         INTEGER,
+                    replies          INTEGER,
+                    num_links        INTEGER,
+                    final_verdict    TEXT,
+                    overall_score    INTEGER,
+                    reason           TEXT,
+                    error            TEXT,
+                    {timing_columns},
+                    total_seconds    REAL,
+                    analyzed_at      REAL NOT NULL,
+                    agent_outputs    TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_tweet ON analyses (tweet_id, analyzed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_user ON analyses (username COLLATE NOCASE, analyzed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_verdict ON analyses (final_verdict, analyzed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_time ON analyses (analyzed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # -------------------------
+    # Writing
+    # -------------------------
+    @staticmethod
+    def build_row(tweet: Dict[str, Any], state: Dict[str, Any], tweet_id: Optional[str] = None,
+                  requested_by: Optional[str] = None, total_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Flattens an extracted tweet and a final pipeline state into one row."""
+        verdict = state.get("final_verdict") or {}
+        timings = state.get("timings") or {}
+        row = {
+            "tweet_id": tweet_id,
+            "username": tweet.get("username"),
+            "requested_by": requested_by,
+            "tweet_text": tweet.get("text"),
+            "tweet_created_at": str(tweet["created_at"]) if tweet.get("created_at") else None,
+            "likes": tweet.get("likes"),
+            "retweets": tweet.get("retweets"),
+            "replies": tweet.get("replies"),
+            "num_links": len(state.get("links") or []),
+            "final_verdict": verdict.get("final_verdict"),
+            "overall_score": _to_int(verdict.get("overall_score")),
+            "reason": verdict.get("reason"),
+            "error": verdict.get("error"),
+            "total_seconds": total_seconds,
+            "analyzed_at": time.time(),
+            "agent_outputs": _dumps({key: state.get(key) for key in AGENT_OUTPUT_KEYS}),
+        }
+        for node in TIMED_NODES:
+            spent = [seconds for key, seconds in timings.items() if key == node or key.startswith(f"{node}:")]
+            row[f"{node}_seconds"] = sum(spent) if spent else None
+        return row
+
+    def record_many(self, rows: Iterable[Dict[str, Any]]):
+        """Appends rows in a single transaction."""
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO analyses ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                ([row.get(column) for column in COLUMNS] for row in rows),
+            )
+
+    def record(self, tweet: Dict[str, Any], state: Dict[str, Any], **kwargs):
+        """Appends one analysis. kwargs are passed to `build_row`."""
+        self.record_many([self.build_row(tweet, state, **kwargs)])
+
+    # -------------------------
+    # Reading
+    # -------------------------
+    def search(self, tweet_id: Optional[str] = None, username: Optional[str] = None,
+               verdict: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+               text: Optional[str] = None, limit: int = 50, offset: int = 0,
+               include_outputs: bool = False) -> List[Dict[str, Any]]:
+        """
+        Newest-first search over recorded analyses. Every filter is optional;
+        `since`/`until` are Unix timestamps and `text` is a substring match.
+        """
+        clauses, params = [], []
+        if tweet_id:
+            clauses.append("tweet_id = ?")
+            params.append(tweet_id)
+        if username:
+            clauses.append("username = ? COLLATE NOCASE")
+            params.append(username.lstrip("@"))
+        if verdict:
+            clauses.append("final_verdict = ?")
+            params.append(verdict)
+        if since is not None:
+            clauses.append("analyzed_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("analyzed_at < ?")
+            params.append(until)
+        if text:
+            clauses.append("tweet_text LIKE ?")
+            params.append(f"%{text}%")
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM analyses {where} ORDER BY analyzed_at DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+
+        results = []
+        for row in rows:
+            item = dict(row)
+            outputs = item.pop("agent_outputs")
+            if include_outputs:
+                item["agent_outputs"] = json.loads(outputs) if outputs else None
+            results.append(item)
+        return results
+
+    def history(self, tweet_id: str) -> List[Dict[str, Any]]:
+        """Every recorded analysis of one tweet, newest first, with agent outputs."""
+        return self.search(tweet_id=tweet_id, limit=-1, include_outputs=True)
+
+    # -------------------------
+    # Columnar export
+    # -------------------------
+    def export(self, path: str, format: str = "parquet", batch_size: int = 100_000,
+               include_outputs: bool = False) -> int:
+        """
+        Streams the whole table to a Parquet file or Arrow IPC (feather) file
+        in batches, so exports of millions of rows run in bounded memory.
+        Returns the number of rows written.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            import pyarrow.ipc as ipc
+        except ImportError as e:
+            raise ImportError("pyarrow is required for history exports: pip install pyarrow") from e
+
+        columns = ["id", *[c for c in COLUMNS if include_outputs or c != "agent_outputs"]]
+        schema = pa.schema([
+            (column, pa.string() if column in (
+                "tweet_id", "username", "requested_by", "tweet_text", "tweet_created_at",
+                "final_verdict", "reason", "error", "agent_outputs",
+            ) else pa.float64() if column.endswith("_seconds") or column == "analyzed_at" else pa.int64())
+            for column in columns
+        ])
+
+        if format == "parquet":
+            writer = pq.ParquetWriter(path, schema)
+        elif format in ("arrow", "feather"):
+            writer = ipc.new_file(path, schema)
+        else:
+            raise ValueError(f"Unsupported export format: {format}")
+
+        written = 0
+        conn = self._connect()
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(columns)} FROM analyses ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                arrays = [pa.array([row[i] for row in rows], type=schema.field(i).type) for i in range(len(columns))]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                written += len(rows)
+        finally:
+            conn.close()
+            writer.close()
+        return written
+
+
+# -------------------------
+# MAIN
+# -------------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the verdict history for offline analysis.")
+    parser.add_argument("output", help="e.g. history.parquet or history.arrow")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--include-outputs", action="store_true", help="also export the agent_outputs JSON column")
+    args = parser.parse_args()
+
+    count = HistoryStore().export(args.output, format=args.format, include_outputs=args.include_outputs)
+    print(f"Exported {count} analyses to {args.output}")
@@ -0,0 +1,459 @@
+import abc
+import collections
+import heapq
+import itertools
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+try:
+    import redis
+except ImportError:  # only needed for redis:// queues
+    redis = None
+
+from scheduler import LANES
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SERVICE_SAMPLES = 20  # completed jobs averaged for the service-time estimate
+WORKER_TTL = 30.0     # seconds without a heartbeat before a worker's slots stop counting
+
+
+def _dumps(data: Any) -> str:
+    # Tweets carry datetimes (created_at); store them as strings.
+    return json.dumps(data, separators=(",", ":"), default=str)
+
+
+class JobQueue(abc.ABC):
+    """
+    Interface shared by every queue backend. The web tier calls `enqueue`,
+    `get` and `counts`; workers call `claim`, `complete` and `fail`.
+
+    Jobs are plain dicts: id, lane, priority, payload, status, result, error,
+    created_at, started_at, finished_at. Pending jobs are claimed by lane
+    (interactive first) and then by ascending priority.
+
+    Each completed job's run time is recorded once, when it completes;
+    `counts` reports the mean of the last SERVICE_SAMPLES as `avg_service`.
+    Workers announce how many jobs they run at once through `heartbeat`;
+    `counts` reports the live total as `capacity`.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, payload: Dict[str, Any], lane: str = LANES[0], priority: float = 0.0) -> str:
+        """Adds a pending job and returns its ID."""
+
+    @abc.abstractmethod
+    def claim(self, timeout: float = 5.0) -> Optional[Dict[str, Any]]:
+        """Takes the next pending job, waiting up to `timeout` seconds for one."""
+
+    @abc.abstractmethod
+    def complete(self, job_id: str, result: Any):
+        """Marks a running job done with its result."""
+
+    @abc.abstractmethod
+    def fail(self, job_id: str, error: str):
+        """Marks a running job failed with an error message."""
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the job, or None if the ID is unknown."""
+
+    @abc.abstractmethod
+    def heartbeat(self, worker_id: str, slots: int):
+        """Records that `worker_id` is alive and runs up to `slots` jobs at once."""
+
+    @abc.abstractmethod
+    def counts(self) -> Dict[str, Any]:
+        """
+        {"pending": {lane: n}, "running": n, "head_priority": float,
+         "avg_service": float or None, "capacity": slots of live workers}
+        """
+
+
+# --- 1. In-process (threads, single Flask process) ---
+
+class InProcessQueue(JobQueue):
+    """
+    Heap-backed queue for development; workers must be threads in the same
+    process. Finished jobs are kept for `result_ttl` seconds so the result
+    page can read them, then dropped; counts are kept as running totals.
+    """
+
+    def __init__(self, result_ttl: float = 15 * 60):
+        self.result_ttl = result_ttl
+        self._cond = threading.Condition()
+        self._heap = []
+        self._jobs = {}
+        self._seq = itertools.count()
+        self._service = collections.deque(maxlen=SERVICE_SAMPLES)
+        self._finished = collections.deque()  # (finished_at, job_id), oldest first
+        self._pending = {lane: 0 for lane in LANES}
+        self._running = 0
+        self._workers = {}
+
+    def _purge(self, now: float):
+        while self._finished and self._finished[0][0] < now - self.result_ttl:
+            self._jobs.pop(self._finished.popleft()[1], None)
+
+    def enqueue(self, payload, lane=LANES[0], priority=0.0):
+        job_id = uuid.uuid4().hex
+        with self._cond:
+            self._jobs[job_id] = {
+                "id": job_id, "lane": lane, "priority": priority, "payload": payload,
+                "status": PENDING, "result": None, "error": None,
+                "created_at": time.time(), "started_at": None, "finished_at": None,
+            }
+            heapq.heappush(self._heap, (LANES.index(lane), priority, next(self._seq), job_id))
+            self._pending[lane] += 1
+            self._cond.notify()
+        return job_id
+
+    def claim(self, timeout=5.0):
+        with self._cond:
+            if not self._heap:
+                self._cond.wait(timeout)
+            if not self._heap:
+                return None
+            job_id = heapq.heappop(self._heap)[-1]
+            job = self._jobs[job_id]
+            job.update(status=RUNNING, started_at=time.time())
+            self._pending[job["lane"]] -= 1
+            self._running += 1
+            return dict(job)
+
+    def _finish(self, job_id: str, **fields) -> Dict[str, Any]:
+        job = self._jobs[job_id]
+        if job["status"] == RUNNING:
+            self._running -= 1
+        job.update(**fields, finished_at=time.time())
+        self._finished.append((job["finished_at"], job_id))
+        self._purge(job["finished_at"])
+        return job
+
+    def complete(self, job_id, result):
+        with self._cond:
+            job = self._finish(job_id, status=DONE, result=result)
+            self._service.append(job["finished_at"] - job["started_at"])
+
+    def fail(self, job_id, error):
+        with self._cond:
+            self._finish(job_id, status=FAILED, error=error)
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def heartbeat(self, worker_id, slots):
+        with self._cond:
+            self._workers[worker_id] = (slots, time.time())
+
+    def counts(self):
+        now = time.time()
+        with self._cond:
+            self._purge(now)
+            service = list(self._service)
+            return {
+                "pending": dict(self._pending),
+                "running": self._running,
+                # The heap only holds pending jobs, which admission keeps to a few dozen.
+                "head_priority": min((entry[1] for entry in self._heap), default=0.0),
+                "avg_service": sum(service) / len(service) if service else None,
+                "capacity": sum(slots for slots, seen in self._workers.values() if seen > now - WORKER_TTL),
+            }
+
+
+# --- 2. SQLite (multiple processes on one machine) ---
+
+class SQLiteQueue(JobQueue):
+    """
+    Durable queue shared by processes through one SQLite file. A job whose
+    worker died is handed out again once `visibility_timeout` has passed;
+    the checkpointed pipeline then resumes it instead of starting over.
+    """
+
+    def __init__(self, path: str = "jobs.sqlite", visibility_timeout: float = 600.0, poll_interval: float = 0.5):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id          TEXT PRIMARY KEY,
+                    lane        TEXT NOT NULL,
+                    lane_rank   INTEGER NOT NULL,
+                    priority    REAL NOT NULL,
+                    payload     TEXT NOT NULL,
+                    status      TEXT NOT NULL,
+                    result      TEXT,
+                    error       TEXT,
+                    created_at  REAL NOT NULL,
+                    started_at  REAL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (status, lane_rank, priority, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (status, finished_at)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS workers (
+                    id      TEXT PRIMARY KEY,
+                    slots   INTEGER NOT NULL,
+                    seen_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        job = dict(row)
+        job.pop("lane_rank")
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, payload, lane=LANES[0], priority=0.0):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, lane, lane_rank, priority, payload, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, lane, LANES.index(lane), priority, _dumps(payload), PENDING, time.time()),
+            )
+        return job_id
+
+    def _claim_once(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front so two workers can't claim the same row.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE status = ? OR (status = ? AND started_at < ?)
+                ORDER BY lane_rank, priority, created_at
+                LIMIT 1
+                """,
+                (PENDING, RUNNING, now - self.visibility_timeout),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, now, row["id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        job = self._row(row)
+        job.update(status=RUNNING, started_at=now)
+        return job
+
+    def claim(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._claim_once()
+            if job or time.monotonic() >= deadline:
+                return job
+            time.sleep(self.poll_interval)
+
+    def complete(self, job_id, result):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+                (DONE, _dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def heartbeat(self, worker_id, slots):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?)", (worker_id, slots, time.time()))
+
+    def counts(self):
+        with self._connect() as conn:
+            capacity = conn.execute(
+                "SELECT COALESCE(SUM(slots), 0) FROM workers WHERE seen_at > ?", (time.time() - WORKER_TTL,)
+            ).fetchone()[0]
+            pending = dict(conn.execute(
+                "SELECT lane, COUNT(*) FROM jobs WHERE status = ? GROUP BY lane", (PENDING,)
+            ).fetchall())
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (RUNNING,)).fetchone()[0]
+            head = conn.execute("SELECT MIN(priority) FROM jobs WHERE status = ?", (PENDING,)).fetchone()[0]
+            avg_service = conn.execute(
+                """
+                SELECT AVG(finished_at - started_at) FROM (
+                    SELECT finished_at, started_at FROM jobs WHERE status = ?
+                    ORDER BY finished_at DESC LIMIT ?
+                )
+                """,
+                (DONE, SERVICE_SAMPLES),
+            ).fetchone()[0]
+        return {
+            "pending": {lane: pending.get(lane, 0) for lane in LANES},
+            "running": running,
+            "head_priority": head or 0.0,
+            "avg_service": avg_service,
+            "capacity": capacity,
+        }
+
+
+# --- 3. Redis (workers on several machines) ---
+
+class RedisQueue(JobQueue):
+    """
+    Redis-backed queue. Each lane is a sorted set scored by priority and each
+    job is a hash. Pass `client` to use an existing connection or a local
+    stand-in such as fakeredis.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client=None, prefix: str = "agentic",
+                 visibility_timeout: float = 600.0, poll_interval: float = 0.5):
+        if client is None:
+            if redis is None:
+                raise ImportError("redis is required for redis:// job queues: pip install redis")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix, *parts))
+
+    def _decode(self, raw: Dict) -> Dict[str, Any]:
+        job = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+               for k, v in raw.items()}
+        for field in ("priority", "created_at", "started_at", "finished_at"):
+            job[field] = float(job[field]) if job.get(field) else None
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job.get("result") else None
+        job["error"] = job.get("error") or None
+        return job
+
+    def enqueue(self, payload, lane=LANES[0], priority=0.0):
+        job_id = uuid.uuid4().hex
+        pipe = self.client.pipeline()
+        pipe.hset(self._key("job", job_id), mapping={
+            "id": job_id, "lane": lane, "priority": priority, "payload": _dumps(payload),
+            "status": PENDING, "created_at": time.time(),
+        })
+        pipe.zadd(self._key("pending", lane), {job_id: priority})
+        pipe.execute()
+        return job_id
+
+    def _requeue_expired(self):
+        expired = self.client.zrangebyscore(self._key("running"), 0, time.time() - self.visibility_timeout)
+        for raw_id in expired:
+            job_id = raw_id.decode() if isinstance(raw_id, bytes) else raw_id
+            if self.client.zrem(self._key("running"), job_id):
+                job = self._decode(self.client.hgetall(self._key("job", job_id)))
+                self.client.hset(self._key("job", job_id), "status", PENDING)
+                self.client.zadd(self._key("pending", job["lane"]), {job_id: job["priority"]})
+
+    def _claim_once(self) -> Optional[Dict[str, Any]]:
+        self._requeue_expired()
+        for lane in LANES:
+            popped = self.client.zpopmin(self._key("pending", lane))
+            if popped:
+                raw_id = popped[0][0]
+                job_id = raw_id.decode() if isinstance(raw_id, bytes) else raw_id
+                now = time.time()
+                self.client.hset(self._key("job", job_id), mapping={"status": RUNNING, "started_at": now})
+                self.client.zadd(self._key("running"), {job_id: now})
+                return self._decode(self.client.hgetall(self._key("job", job_id)))
+        return None
+
+    def claim(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._claim_once()
+            if job or time.monotonic() >= deadline:
+                return job
+            time.sleep(self.poll_interval)
+
+    def _finish(self, job_id: str, **fields):
+        pipe = self.client.pipeline()
+        pipe.hset(self._key("job", job_id), mapping={**fields, "finished_at": time.time()})
+        pipe.zrem(self._key("running"), job_id)
+        pipe.execute()
+
+    def complete(self, job_id, result):
+        started = self.client.hget(self._key("job", job_id), "started_at")
+        self._finish(job_id, status=DONE, result=_dumps(result))
+        if started:
+            pipe = self.client.pipeline()
+            pipe.lpush(self._key("service"), time.time() - float(started))
+            pipe.ltrim(self._key("service"), 0, SERVICE_SAMPLES - 1)
+            pipe.execute()
+
+    def fail(self, job_id, error):
+        self._finish(job_id, status=FAILED, error=error)
+
+    def get(self, job_id):
+        raw = self.client.hgetall(self._key("job", job_id))
+        return self._decode(raw) if raw else None
+
+    def heartbeat(self, worker_id, slots):
+        pipe = self.client.pipeline()
+        pipe.hset(self._key("worker_slots"), worker_id, slots)
+        pipe.zadd(self._key("workers"), {worker_id: time.time()})
+        pipe.execute()
+
+    def _capacity(self) -> int:
+        cutoff = time.time() - WORKER_TTL
+        expired = self.client.zrangebyscore(self._key("workers"), 0, cutoff)
+        if expired:
+            self.client.zremrangebyscore(self._key("workers"), 0, cutoff)
+            self.client.hdel(self._key("worker_slots"), *expired)
+        live = self.client.zrange(self._key("workers"), 0, -1)
+        return sum(int(slots) for slots in self.client.hmget(self._key("worker_slots"), live) if slots) if live else 0
+
+    def counts(self):
+        heads = [self.client.zrange(self._key("pending", lane), 0, 0, withscores=True) for lane in LANES]
+        scores = [head[0][1] for head in heads if head]
+        service = [float(seconds) for seconds in self.client.lrange(self._key("service"), 0, -1)]
+        return {
+            "pending": {lane: self.client.zcard(self._key("pending", lane)) for lane in LANES},
+            "running": self.client.zcard(self._key("running")),
+            "head_priority": min(scores) if scores else 0.0,
+            "avg_service": sum(service) / len(service) if service else None,
+            "capacity": self._capacity(),
+        }
+
+
+def make_queue(url: str) -> JobQueue:
+    """Builds a queue from a URL: memory://, sqlite:///path/to/jobs.sqlite or redis://host:port/db."""
+    if url.startswith("memory://"):
+        return InProcessQueue()
+    if url.startswith("sqlite:///"):
+        return SQLiteQueue(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisQueue(url)
+    raise ValueError(f"Unsupported job queue URL: {url}")
@@ -0,0 +1,133 @@
+import math
+import threading
+import time
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)  # in priority order
+
+
+class SchedulerRejected(Exception):
+    """Raised when a request is refused at admission. `retry_after` is in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _TokenBucket:
+    """Per-user rate limit: `rate` requests per minute with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consumes one token. Returns 0, or the seconds until a token is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FairScheduler:
+    """
+    Admission control and weighted fair queuing in front of the job queue.
+
+    - Each user has a token-bucket rate limit and a weight (quota).
+    - Each admitted request gets a virtual finish tag, used as its job
+      priority. Workers claim jobs by lane first (interactive before bulk)
+      and then by tag, so a user who submits many requests only advances
+      their own tags and cannot crowd out other users.
+    - When the queue is full or the estimated wait exceeds `max_wait`, the
+      request is rejected immediately with an estimated retry time.
+
+    Buckets and finish tags live in this object, so with several web
+    processes each one enforces the limits on its own: a user can get up to
+    `burst` requests through every process, and fair queuing only orders
+    the requests admitted by the same process. Queue length, capacity and
+    service time come from the shared queue and are global.
+    """
+
+    def __init__(self, max_concurrent=4, max_queue=20, max_wait=120.0,
+                 default_quota=None, quotas=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.default_quota = default_quota or {"weight": 1.0, "rate_per_min": 6, "burst": 3}
+        self.quotas = quotas or {}
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._last_finish = {}
+        self._virtual_time = 0.0
+        self._avg_service = 30.0  # seconds, until the queue reports completed jobs
+
+    def _quota(self, user: str) -> dict:
+        return {**self.default_quota, **self.quotas.get(user, {})}
+
+    def _estimated_wait(self, ahead: int, running: int, capacity: int) -> float:
+        if running + ahead < capacity:
+            return 0.0
+        rounds = (ahead + 1) / capacity
+        return math.ceil(rounds) * self._avg_service
+
+    def admit_queued(self, user: str, lane: str, counts: dict) -> float:
+        """
+        Checks rate limits and capacity for a request about to be enqueued.
+        `counts` is the queue's snapshot (see JobQueue.counts); the returned
+        finish tag should be used as the job's priority.
+        """
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+        pending = counts["pending"]
+        rank = LANES.index(lane)
+        ahead = sum(n for l, n in pending.items() if LANES.index(l) <= rank)
+        queued, running = sum(pending.values()), counts["running"]
+        # Slots of the workers that are actually alive; max_concurrent until one reports.
+        capacity = counts.get("capacity") or self.max_concurrent
+        quota = self._quota(user)
+
+        with self._lock:
+            # Jobs with lower tags have already been dispatched by the workers.
+            self._virtual_time = max(self._virtual_time, counts["head_priority"])
+            if counts.get("avg_service"):
+                self._avg_service = counts["avg_service"]
+
+            bucket = self._buckets.get(user)
+            if bucket is None:
+                bucket = self._buckets[user] = _TokenBucket(quota["rate_per_min"], quota["burst"])
+            if queued >= self.max_queue:
+                wait = self._estimated_wait(queued, running, capacity)
+                raise SchedulerRejected("The analysis queue is full.", math.ceil(wait))
+
+            wait = self._estimated_wait(ahead, running, capacity)
+            if wait > self.max_wait:
+                raise SchedulerRejected("The system is saturated.", math.ceil(wait))
+
+            limited = bucket.take()
+            if limited:
+                raise SchedulerRejected(f"Rate limit reached for {user}.", math.ceil(limited))
+
+            start = max(self._virtual_time, self._last_finish.get(user, 0.0))
+            finish_tag = start + 1.0 / quota["weight"]
+            self._last_finish[user] = finish_tag
+            return finish_tag
+
+    def refund(self, user: str, finish_tag: float):
+        """
+        Returns an admission that never reached the queue (e.g. the tweet could
+        not be fetched): gives back the rate-limit token and, unless the user
+        has been admitted again since, their finish tag.
+        """
+        with self._lock:
+            bucket = self._buckets.get(user)
+            if bucket is not None:
+                bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+            if self._last_finish.get(user) == finish_tag:
+                self._last_finish[user] = finish_tag - 1.0 / self._quota(user)["weight"]
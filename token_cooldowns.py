@@ -0,0 +1,42 @@
+import json
+import os
+import time
+
+# Shared by the web tier (app.py) and watch mode (watch.py), which draw on the
+# same bearer tokens: a token either of them used is cooling down for both.
+COOLDOWN_FILE = "token_cooldowns.json"
+COOLDOWN_TIME = 15 * 60 * 1000  # 15 minutes in ms
+TOKEN_IDS = ["1", "2", "3", "4"]
+
+
+def load_cooldowns():
+    """Load cooldown timestamps from JSON file (ms since epoch)."""
+    if not os.path.exists(COOLDOWN_FILE):
+        # initialize with zeros (string keys)
+        save_cooldowns({token: 0 for token in TOKEN_IDS})
+    with open(COOLDOWN_FILE, 'r') as f:
+        return json.load(f)
+
+
+def save_cooldowns(data):
+    """Save cooldown timestamps to JSON file (atomically, since two processes write it)."""
+    tmp = f"{COOLDOWN_FILE}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, COOLDOWN_FILE)
+
+
+def get_remaining_ms_for_token(token_str):
+    """Return remaining milliseconds of cooldown for a given token string key."""
+    cooldowns = load_cooldowns()
+    last_used = int(cooldowns.get(token_str, 0))
+    now = int(time.time() * 1000)
+    remaining = max(0, COOLDOWN_TIME - (now - last_used))
+    return remaining
+
+
+def mark_used(token_str):
+    """Starts the cooldown for a token that was just used."""
+    cooldowns = load_cooldowns()
+    cooldowns[str(token_str)] = int(time.time() * 1000)
+    save_cooldowns(cooldowns)
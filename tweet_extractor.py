@@ -41,10 +41,12 @@ def extract_tweet_info(tweet_id: str, bearer_token: str) -> dict:
 
         # Handle media if present
         if "media" in tweet.includes:
+            # Videos and GIFs have no `url`, only a preview frame.
             media_urls = [
                 {
                     'type': media.type,
-                    'url': getattr(media, "url", getattr(media, "preview_image_url", None))
+                    'url': getattr(media, "url", None) or getattr(media, "preview_image_url", None),
+                    'preview_image_url': getattr(media, "preview_image_url", None)
                 }
                 for media in tweet.includes['media']
             ]
@@ -55,3 +57,91 @@ def extract_tweet_info(tweet_id: str, bearer_token: str) -> dict:
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
+
+
+TWEET_FIELDS = ["created_at", "public_metrics", "text", "author_id", "attachments"]
+MEDIA_FIELDS = ["url", "preview_image_url", "type"]
+USER_FIELDS = ["username", "name", "profile_image_url"]
+
+
+def _timeline_to_list(response) -> list:
+    """
+    Converts a multi-tweet response (timeline or search) into dicts shaped
+    like `extract_tweet_info`'s, plus the tweet 'id'. Newest first.
+    """
+    if not response.data:
+        return []
+    includes = response.includes or {}
+    users = {user.id: user for user in includes.get('users', [])}
+    media_by_key = {media.media_key: media for media in includes.get('media', [])}
+
+    tweets = []
+    for tweet in response.data:
+        user = users.get(tweet.author_id)
+        metrics = tweet.public_metrics or {}
+        item = {
+            'id': str(tweet.id),
+            'text': tweet.text,
+            'username': user.username if user else None,
+            'name': user.name if user else None,
+            'profile_image_url': user.profile_image_url if user else None,
+            'created_at': tweet.created_at,
+            'likes': metrics.get('like_count', 0),
+            'retweets': metrics.get('retweet_count', 0),
+            'replies': metrics.get('reply_count', 0),
+        }
+        keys = (tweet.attachments or {}).get('media_keys', [])
+        media = [media_by_key[key] for key in keys if key in media_by_key]
+        if media:
+            item['media'] = [
+                {
+                    'type': m.type,
+                    'url': getattr(m, "url", None) or getattr(m, "preview_image_url", None),
+                    'preview_image_url': getattr(m, "preview_image_url", None)
+                }
+                for m in media
+            ]
+        tweets.append(item)
+    return tweets
+
+
+def get_user_id(username: str, bearer_token: str) -> str:
+    """Resolves a username (with or without '@') to its numeric user ID."""
+    client = create_twitter_client(bearer_token)
+    user = client.get_user(username=username.lstrip("@"))
+    if not user.data:
+        raise ValueError(f"User not found: {username}")
+    return str(user.data.id)
+
+
+def fetch_user_tweets_since(user_id: str, bearer_token: str, since_id: str = None, max_results: int = 10) -> list:
+    """
+    Returns the user's tweets newer than `since_id` (newest first). Without a
+    `since_id`, only the latest `max_results` tweets are returned.
+    """
+    client = create_twitter_client(bearer_token)
+    response = client.get_users_tweets(
+        id=user_id,
+        since_id=since_id,
+        max_results=max_results,
+        expansions=["attachments.media_keys", "author_id"],
+        tweet_fields=TWEET_FIELDS,
+        media_fields=MEDIA_FIELDS,
+        user_fields=USER_FIELDS
+    )
+    return _timeline_to_list(response)
+
+
+def search_tweets_since(query: str, bearer_token: str, since_id: str = None, max_results: int = 10) -> list:
+    """Recent-search counterpart of `fetch_user_tweets_since`."""
+    client = create_twitter_client(bearer_token)
+    response = client.search_recent_tweets(
+        query=query,
+        since_id=since_id,
+        max_results=max(10, max_results),  # the search endpoint's minimum
+        expansions=["attachments.media_keys", "author_id"],
+        tweet_fields=TWEET_FIELDS,
+        media_fields=MEDIA_FIELDS,
+        user_fields=USER_FIELDS
+    )
+    return _timeline_to_list(response)
@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import sqlite3
+import time
+import dotenv
+import tweepy
+
+import tweet_extractor as twitter
+from job_queue import JobQueue, make_queue
+from token_cooldowns import get_remaining_ms_for_token, mark_used
+from scheduler import BULK
+from Agentic.profile_store import ProfileStore
+
+dotenv.load_dotenv()
+
+WATCH_DB = os.environ.get("WATCH_DB", "watches.sqlite")
+
+ACCOUNT = "account"
+QUERY = "query"
+
+
+# -------------------------
+# WATCH LIST + CURSORS
+# -------------------------
+class WatchStore:
+    """Watched accounts and search queries, each with its `since_id` cursor."""
+
+    def __init__(self, path: str = WATCH_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS watches (
+                    kind        TEXT NOT NULL,
+                    target      TEXT NOT NULL,
+                    user_id     TEXT,
+                    since_id    TEXT,
+                    last_polled REAL,
+                    PRIMARY KEY (kind, target)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, kind: str, target: str):
+        target = target.lstrip("@").lower() if kind == ACCOUNT else target
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO watches (kind, target) VALUES (?, ?)", (kind, target))
+
+    def remove(self, kind: str, target: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM watches WHERE kind = ? AND target = ?", (kind, target))
+
+    def all(self) -> list:
+        """Least recently polled first, so every watch gets a turn when tokens run short."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM watches ORDER BY COALESCE(last_polled, 0)").fetchall()
+        return [dict(row) for row in rows]
+
+    def update(self, kind: str, target: str, since_id: str = None, user_id: str = None):
+        """Records a poll; the cursor and user ID are only overwritten when given."""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE watches SET
+                    since_id = COALESCE(?, since_id),
+                    user_id = COALESCE(?, user_id),
+                    last_polled = ?
+                WHERE kind = ? AND target = ?
+                """,
+                (since_id, user_id, time.time(), kind, target),
+            )
+
+
+# -------------------------
+# BEARER TOKEN ROTATION
+# -------------------------
+class TokenRotator:
+    """
+    Round-robins polls across the configured bearer tokens. These are the
+    web tier's tokens too, so cooldowns live in the same token_cooldowns.json:
+    a token the landing page used is skipped here, and every poll starts the
+    token's cooldown so the landing page shows it as unavailable.
+    """
+
+    def __init__(self, tokens: dict):
+        self.tokens = {k: v for k, v in tokens.items() if v}
+        self._cycle = itertools.cycle(sorted(self.tokens))
+
+    def next(self):
+        """Returns (token_id, bearer) for the next usable token, or None if all are cooling down."""
+        for _ in range(len(self.tokens)):
+            token_id = next(self._cycle)
+            if get_remaining_ms_for_token(str(token_id)) == 0:
+                return token_id, self.tokens[token_id]
+        return None
+
+    def used(self, token_id):
+        mark_used(token_id)
+
+
+# -------------------------
+# POLLING
+# -------------------------
+def _newest_id(tweets: list) -> str:
+    return max((t['id'] for t in tweets), key=int)
+
+
+async def poll_once(store: WatchStore, rotator: TokenRotator, queue: JobQueue, profiles: ProfileStore,
+                    agent=None, max_results: int = 10) -> int:
+    """
+    Polls every watch once for tweets newer than its cursor. New tweets are
+    queued for analysis on the bulk lane and, for watched accounts, folded
+    into the stored account profile. Returns the number of tweets queued.
+
+    Must always be awaited on the same event loop: the agent's async
+    OpenRouter client is bound to the loop it was first used on.
+    """
+    queued = 0
+    for watch in store.all():
+        token = rotator.next()
+        if token is None:
+            logging.warning("All bearer tokens are cooling down; remaining watches wait for the next round.")
+            break
+        token_id, bearer = token
+        kind, target = watch['kind'], watch['target']
+        rotator.used(token_id)
+
+        try:
+            if kind == ACCOUNT:
+                user_id = watch['user_id'] or twitter.get_user_id(target, bearer)
+                tweets = twitter.fetch_user_tweets_since(user_id, bearer, watch['since_id'], max_results)
+            else:
+                user_id = None
+                tweets = twitter.search_tweets_since(target, bearer, watch['since_id'], max_results)
+        except tweepy.TooManyRequests:
+            logging.warning(f"Token {token_id} rate limited while polling {kind} '{target}'.")
+            store.update(kind, target)
+            continue
+        except Exception as e:
+            logging.error(f"Polling {kind} '{target}' failed: {e}")
+            store.update(kind, target)
+            continue
+
+        if not tweets:
+            store.update(kind, target, user_id=user_id)
+            continue
+        newest = _newest_id(tweets)
+
+        # Update the profile first so the queued analyses find it fresh and
+        # skip the account branch. An account seen for the first time gets
+        # the full analysis; a handful of new posts is no basis for a profile.
+        if kind == ACCOUNT and agent is not None:
+            previous = profiles.get(target)
+            if previous:
+                updated = await agent.update_account_profile_logic(
+                    target, previous['analysis'], [t['text'] for t in reversed(tweets)]
+                )
+            else:
+                updated = await agent.analyze_x_account_logic(target)
+            if not updated.startswith("Error:"):
+                profiles.put(target, updated, since_id=newest)
+
+        priority = queue.counts()["head_priority"] + 1.0
+        for tweet in reversed(tweets):  # oldest first
+            queue.enqueue({"tweet": tweet, "tweet_id": tweet['id'], "user": f"watch:{kind}:{target}"},
+                          lane=BULK, priority=priority)
+        queued += len(tweets)
+        store.update(kind, target, since_id=newest, user_id=user_id)
+        logging.info(f"Queued {len(tweets)} new tweet(s) from {kind} '{target}'.")
+    return queued
+
+
+async def watch_forever(store: WatchStore, rotator: TokenRotator, queue: JobQueue, profiles: ProfileStore,
+                        agent=None, max_results: int = 10, interval: float = 300, once: bool = False):
+    """Runs polling rounds every `interval` seconds on a single event loop."""
+    while True:
+        await poll_once(store, rotator, queue, profiles, agent, max_results)
+        if once:
+            break
+        await asyncio.sleep(interval)
+
+
+# -------------------------
+# MAIN
+# -------------------------
+if __name__ == "__main__":
+    import worker
+
+    parser = argparse.ArgumentParser(description="Poll watched accounts and searches for new tweets and queue them for analysis.")
+    parser.add_argument("--account", action="append", default=[], help="account to watch (repeatable)")
+    parser.add_argument("--query", action="append", default=[], help="search query to watch (repeatable)")
+    parser.add_argument("--queue", default=worker.JOB_QUEUE_URL, help="sqlite:///jobs.sqlite or redis://...")
+    parser.add_argument("--interval", type=float, default=300, help="seconds between polling rounds")
+    parser.add_argument("--max-results", type=int, default=10, help="tweets fetched per watch per poll")
+    parser.add_argument("--once", action="store_true", help="poll a single round and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.queue.startswith("memory://"):
+        parser.error("memory:// queues only work inside the web process; use sqlite:// or redis://")
+
+    store = WatchStore()
+    for account in args.account:
+        store.add(ACCOUNT, account)
+    for query in args.query:
+        store.add(QUERY, query)
+
+    from Agentic.agent import Agent
+
+    rotator = TokenRotator({i: os.environ.get(f"token{i}") for i in range(1, 5)})
+    queue = make_queue(args.queue)
+    profiles = ProfileStore()
+    agent = Agent()
+
+    asyncio.run(watch_forever(store, rotator, queue, profiles, agent, args.max_results, args.interval, args.once))
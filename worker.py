@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+import dotenv
+
+from history_store import HistoryStore
+from job_queue import JobQueue, make_queue
+
+dotenv.load_dotenv()
+
+JOB_QUEUE_URL = os.environ.get("JOB_QUEUE_URL", "memory://")
+TOKEN_REPORT_EVERY = int(os.environ.get("TOKEN_REPORT_EVERY", "50"))  # jobs between per-agent token reports
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "4"))   # jobs each worker process runs at once
+HEARTBEAT_INTERVAL = 10.0  # seconds; well inside job_queue.WORKER_TTL
+
+
+async def process_job(job: dict, history: HistoryStore = None) -> dict:
+    """
+    Runs the analysis pipeline for one queued job and returns its verdict.
+    The tweet, agent outputs and timings are appended to `history` if given,
+    unless the verdict was served from the checkpoint (nothing new ran).
+    """
+    # Imported here so the web tier never loads the agents or models.
+    from Agentic.pipeline import run_pipeline
+
+    payload = job["payload"]
+    tweet = payload["tweet"]
+    start = time.perf_counter()
+    state = await run_pipeline(
+        tweet_text=tweet["text"],
+        username=tweet["username"],
+        tweet_id=payload.get("tweet_id"),
+        reanalyze=payload.get("reanalyze", False),
+        return_state=True,
+        media=tweet.get("media"),
+    )
+    if history is not None and not state.get("from_checkpoint"):
+        try:
+            await asyncio.to_thread(history.record, tweet, state, tweet_id=payload.get("tweet_id"),
+                                    requested_by=payload.get("user"),
+                                    total_seconds=round(time.perf_counter() - start, 3))
+        except Exception as e:
+            # History is best-effort; never fail the user's analysis over it.
+            logging.error(f"Could not record history for job {job['id']}: {e}")
+    return state.get("final_verdict", {"error": "No final_verdict in state"})
+
+
+async def _consume(queue: JobQueue, history: HistoryStore, stop: threading.Event = None):
+    """Claims and processes jobs one at a time until `stop` is set (or forever)."""
+    from Agentic.prompts import ledger
+
+    processed = 0
+    while stop is None or not stop.is_set():
+        # claim() blocks, so it runs off the loop; other consumers keep going meanwhile.
+        job = await asyncio.to_thread(queue.claim, 5.0)
+        if job is None:
+            continue
+        logging.info(f"Worker {os.getpid()} picked up job {job['id']}")
+        try:
+            result = await process_job(job, history)
+            await asyncio.to_thread(queue.complete, job["id"], result)
+        except Exception as e:
+            logging.exception(f"Job {job['id']} failed: {e}")
+            await asyncio.to_thread(queue.fail, job["id"], str(e))
+        processed += 1
+        if TOKEN_REPORT_EVERY and processed % TOKEN_REPORT_EVERY == 0:
+            ledger.log_report()
+
+
+async def _heartbeat(queue: JobQueue, concurrency: int, stop: threading.Event = None):
+    """Keeps this worker's slots counted in the queue's capacity, which the scheduler's wait estimate uses."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    while stop is None or not stop.is_set():
+        try:
+            await asyncio.to_thread(queue.heartbeat, worker_id, concurrency)
+        except Exception as e:
+            logging.error(f"Worker heartbeat failed: {e}")
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+
+async def _work(queue: JobQueue, concurrency: int, stop: threading.Event = None):
+    history = HistoryStore()
+    await asyncio.gather(_heartbeat(queue, concurrency, stop),
+                         *(_consume(queue, history, stop) for _ in range(concurrency)))
+
+
+def work(queue: JobQueue, concurrency: int = 1, stop: threading.Event = None):
+    """
+    Runs `concurrency` job consumers on ONE long-lived event loop. The agents'
+    Gemini and OpenRouter clients are bound to the loop they were first used
+    on, so every job in this process must run on the same loop.
+    """
+    asyncio.run(_work(queue, concurrency, stop))
+
+
+def start_thread_workers(queue: JobQueue, count: int):
+    """Starts an in-process worker thread running `count` jobs at a time; used with the memory:// queue."""
+    threading.Thread(target=work, args=(queue, count), name="pipeline-worker", daemon=True).start()
+
+
+def _worker_process(queue_url: str, concurrency: int):
+    logging.basicConfig(level=logging.INFO)
+    work(make_queue(queue_url), concurrency)
+
+
+# -------------------------
+# MAIN
+# -------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run analysis workers that pull jobs from the shared queue.")
+    parser.add_argument("--queue", default=JOB_QUEUE_URL,
+                        help="sqlite:///jobs.sqlite or redis://host:6379/0 (default: $JOB_QUEUE_URL)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY,
+                        help="jobs each process runs at once on its event loop (default: $WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+
+    if args.queue.startswith("memory://"):
+        parser.error("memory:// queues only work inside the web process; use sqlite:// or redis://")
+
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(args.queue, args.concurrency), name=f"pipeline-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()